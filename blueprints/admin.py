@@ -1,5 +1,4 @@
-import os
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app
 from core.database import get_users_collection, get_chat_history_collection
 from core.pinecone_db import purge_namespace
 from bson.objectid import ObjectId
@@ -19,9 +18,9 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        # Load from env or fallback to defaults
-        admin_email = os.getenv('ADMIN_EMAIL', 'admin@iota.com')
-        admin_password = os.getenv('ADMIN_PASSWORD', 'adminpassword123')
+        # Snapshotted from env (or defaults) once at startup in Config
+        admin_email = current_app.config['ADMIN_EMAIL']
+        admin_password = current_app.config['ADMIN_PASSWORD']
         
         if email == admin_email and password == admin_password:
             session['is_admin'] = True
@@ -2,16 +2,63 @@ import os
 import hashlib
 import tempfile
 import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from flask import Blueprint, render_template, request, jsonify, session, current_app, redirect, url_for
+from flask import Blueprint, Response, render_template, request, jsonify, session, current_app, redirect, url_for
 from core.database import get_chat_history_collection, get_clones_collection, upload_file_to_supabase
 from core.parser import parse_chat_log, get_unique_speakers
-from core.gemini_engine import generate_embedding, generate_chat_response, generate_embeddings_batch, generate_global_persona_profile
+from core.gemini_engine import generate_embedding, stream_chat_response, generate_embeddings_batch, generate_global_persona_profile
 from core.pinecone_db import upsert_vectors, search_vectors, purge_namespace
 
 chat_bp = Blueprint('chat', __name__, url_prefix='/chat')
 
+# Shared pool for the live-query semantic lookup, so /send can overlap it with MongoDB I/O.
+# Sync gunicorn workers serve one request at a time and /send blocks on the result, so only
+# one lookup is in flight per process; the second slot is headroom for the threaded dev server.
+_retrieval_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrieval")
+
+# Single background worker for memory consolidation: runs off the request path and
+# serializes consolidation so two turns can't embed/upsert the same window twice.
+# Executor threads are joined at interpreter exit, so queued work drains on shutdown.
+_memory_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+
+# (user_id, clone_id) pairs with a consolidation job already queued, so a burst of turns
+# (or a long Pinecone outage) can't pile up duplicate jobs for the same namespace
+_pending_consolidations = set()
+_pending_lock = threading.Lock()
+
+# Upper bound on unembedded messages a single consolidation run loads into memory
+MAX_CONSOLIDATION_MESSAGES = 200
+
+def _combined_text(history, context, response):
+    """The text embedded (and hashed into the vector id) for one context-response pair."""
+    return (
+        f"[History]: {history}\n"
+        f"[Context]: {context}\n"
+        f"[Response]: {response}"
+    )
+
+def _build_vectors(combined_texts, embeddings, metadata_list):
+    """
+    Zip pair texts, embeddings and metadata into Pinecone upsert dicts.
+    Vector ids are the MD5 of the embedded text, so re-ingesting a pair overwrites instead of duplicating.
+    """
+    return [
+        {
+            "id": hashlib.md5(combined_text.encode("utf-8")).hexdigest(),
+            "values": embedding,
+            "metadata": metadata
+        }
+        for combined_text, embedding, metadata in zip(combined_texts, embeddings, metadata_list)
+    ]
+
+def _is_bad_input_error(e):
+    """True for API errors that reject the input itself (4xx other than 429), which a retry won't fix."""
+    code = getattr(e, "code", None)
+    return isinstance(code, int) and 400 <= code < 500 and code != 429
+
 @chat_bp.route('/')
 def chat_ui():
     if 'user_id' not in session:
@@ -109,7 +156,8 @@ def finalize_replica():
         current_app.logger.warning(f"Global persona analysis failed: {e}")
 
     # 3. Create Clone in MongoDB
-    clone_id = hashlib.md5(f"{user_id}_{clone_name}_{datetime.utcnow().isoformat()}".encode('utf-8')).hexdigest()
+    # blake2b-128 keeps the same 32-hex-char id shape as the md5 ids already stored
+    clone_id = hashlib.blake2b(f"{user_id}_{clone_name}_{datetime.utcnow().isoformat()}".encode('utf-8'), digest_size=16).hexdigest()
     clones_col.insert_one({
         "user_id": user_id,
         "clone_id": clone_id,
@@ -128,12 +176,7 @@ def finalize_replica():
         context  = pair['context']
         response = pair['response']
         
-        combined_text = (
-            f"[History]: {history}\n"
-            f"[Context]: {context}\n"
-            f"[Response]: {response}"
-        )
-        combined_texts.append(combined_text)
+        combined_texts.append(_combined_text(history, context, response))
         metadata_list.append({
             "context":          context,
             "response":         response,
@@ -147,16 +190,7 @@ def finalize_replica():
         os.remove(temp_path)
         return jsonify({"error": f"Failed to generate embeddings: {str(e)}"}), 500
         
-    vectors = []
-    for idx, embedding in enumerate(embeddings):
-        combined_text = combined_texts[idx]
-        vector_id = hashlib.md5(combined_text.encode("utf-8")).hexdigest()
-        
-        vectors.append({
-            "id": vector_id,
-            "values": embedding,
-            "metadata": metadata_list[idx]
-        })
+    vectors = _build_vectors(combined_texts, embeddings, metadata_list)
         
     if vectors:
         try:
@@ -182,11 +216,12 @@ def finalize_replica():
         "clone_id": clone_id
     }), 200
 
-def process_continuous_memory(user_id, clone_id):
+def process_continuous_memory(user_id, clone_id, logger):
     """
-    Background thread worker: scans for 10+ unembedded messages,
+    Background worker job: scans for 10+ unembedded messages,
     groups them into pairs (matching the sliding-window parser structure),
     generates vectors using models/gemini-embedding-2, and upserts to Pinecone.
+    Runs outside the app context, so the caller hands it the app logger.
     """
     try:
         chat_history_col = get_chat_history_collection()
@@ -196,10 +231,15 @@ def process_continuous_memory(user_id, clone_id):
             "user_id": user_id,
             "clone_id": clone_id,
             "embedded": False
-        }).sort("timestamp", 1)
+        }).sort("timestamp", 1).limit(MAX_CONSOLIDATION_MESSAGES)
         
         unembedded_messages = list(unembedded_cursor)
         
+        # A trailing user message has its AI reply beyond the cap (or still being generated);
+        # leave it unembedded so the next run can pair it instead of marking it as consumed
+        if unembedded_messages and unembedded_messages[-1].get('speaker') == 'user':
+            unembedded_messages.pop()
+        
         # 2. Check if we have hit the 10-message threshold
         if len(unembedded_messages) < 10:
             return
@@ -209,7 +249,8 @@ def process_continuous_memory(user_id, clone_id):
         target_persona = clone_record.get('target_persona', 'AI') if clone_record else 'AI'
             
         # 3. Create sliding-window Context-Response pairs
-        vectors = []
+        combined_texts = []
+        metadata_list = []
         for i in range(len(unembedded_messages)):
             msg = unembedded_messages[i]
             
@@ -236,56 +277,92 @@ def process_continuous_memory(user_id, clone_id):
                     response = msg['message']
                     
                     # Exact format matching the WhatsApp parser
-                    combined_text = (
-                        f"[History]: {history}\n"
-                        f"[Context]: {context}\n"
-                        f"[Response]: {response}"
-                    )
+                    combined_texts.append(_combined_text(history, context, response))
+                    metadata_list.append({
+                        "context":          context,
+                        "response":         response,
+                        "metadata_history": history
+                    })
                     
-                    try:
-                        embedding = generate_embedding(combined_text, is_document=True)
-                        vector_id = hashlib.md5(combined_text.encode("utf-8")).hexdigest()
-                        
-                        vectors.append({
-                            "id": vector_id,
-                            "values": embedding,
-                            "metadata": {
-                                "context":          context,
-                                "response":         response,
-                                "metadata_history": history
-                            }
-                        })
-                    except Exception as e:
-                        print(f"Background embedding failed for a pair: {e}")
-                        
-        # 4. Upsert to Pinecone
+        # 4. Embed all pairs in one batched round trip instead of one call per pair
+        try:
+            embeddings = generate_embeddings_batch(combined_texts, is_document=True)
+        except Exception as e:
+            err_str = str(e).lower()
+            if "429" in err_str or "quota" in err_str or "exhausted" in err_str:
+                logger.warning("Background batch embedding failed: %s", e)
+                return # Leave messages unembedded so the next turn retries
+            # The failure may be one bad input; embed pair by pair and drop only pairs the API
+            # rejects as invalid, so a single poison message can't wedge the namespace.
+            # Quota, 5xx and network errors abort the run so the next turn retries the window.
+            logger.warning("Background batch embedding failed, retrying per pair: %s", e)
+            embeddings = []
+            for idx, combined_text in enumerate(combined_texts):
+                if idx:
+                    # Same pacing as the batch path (20 items per 7s) to stay under the TPM limit
+                    time.sleep(0.35)
+                try:
+                    embeddings.append(generate_embedding(combined_text, is_document=True))
+                except Exception as pair_error:
+                    if not _is_bad_input_error(pair_error):
+                        logger.warning("Per-pair embedding failed, leaving messages for the next run: %s", pair_error)
+                        return
+                    logger.warning("Dropping memory pair rejected by the embedding API: %s", pair_error)
+                    embeddings.append(None)
+            
+        vectors = [v for v in _build_vectors(combined_texts, embeddings, metadata_list) if v["values"] is not None]
+        
+        # 5. Upsert to Pinecone
         if vectors:
             try:
                 upsert_vectors(user_id=user_id, clone_id=clone_id, vectors=vectors)
             except Exception as e:
-                print(f"Background Pinecone upsert failed: {e}")
+                logger.warning("Background Pinecone upsert failed: %s", e)
                 return # Don't mark as embedded if upsert failed
                 
-        # 5. Mark messages as embedded
+        # 6. Mark messages as embedded
         msg_ids = [msg['_id'] for msg in unembedded_messages]
         chat_history_col.update_many(
             {"_id": {"$in": msg_ids}},
             {"$set": {"embedded": True}}
         )
-        print(f"Successfully consolidated {len(vectors)} memories for user {user_id}")
+        logger.debug("Consolidated %d memories for user %s", len(vectors), user_id)
         
     except Exception as e:
-        print(f"Continuous memory thread failed: {e}")
+        logger.exception("Continuous memory consolidation failed: %s", e)
+
+def queue_memory_consolidation(user_id, clone_id, logger):
+    """Queue process_continuous_memory for this namespace unless a run is already waiting."""
+    key = (user_id, clone_id)
+    with _pending_lock:
+        if key in _pending_consolidations:
+            return
+        _pending_consolidations.add(key)
+    _memory_executor.submit(_run_memory_consolidation, user_id, clone_id, logger)
+
+def _run_memory_consolidation(user_id, clone_id, logger):
+    # Release the slot before running so turns that arrive mid-run can queue a follow-up
+    with _pending_lock:
+        _pending_consolidations.discard((user_id, clone_id))
+    process_continuous_memory(user_id, clone_id, logger)
+
+def _retrieve_semantic_context(user_id, clone_id, user_message):
+    """
+    Embed the live query and fetch the top semantic matches from the clone's namespace.
+    Runs on the retrieval pool so it doesn't need an app context.
+    """
+    query_embedding = generate_embedding(user_message, is_document=False)
+    return search_vectors(user_id=user_id, clone_id=clone_id, query_embedding=query_embedding, top_k=3)
 
 @chat_bp.route('/send', methods=['POST'])
 def send_message():
     """
     Live Generation Pipeline:
-    1. Save user message to MongoDB.
-    2. Pull last 5 rows of ChatHistory.
+    1. Pull last 10 rows of ChatHistory (prior turns only).
+    2. Save user message to MongoDB.
     3. Query Pinecone via semantic matching.
-    4. Pass dual-context to Gemini Flash.
-    5. Save response back to MongoDB.
+    4. Pass dual-context to Gemini Flash and stream the reply back as plain text.
+    5. Save response back to MongoDB once the stream completes.
     """
     if 'user_id' not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -298,10 +375,25 @@ def send_message():
         return jsonify({"error": "Message is required"}), 400
         
     chat_history_col = get_chat_history_collection()
-    
+
     active_clone_id = session.get('active_clone_id', 'default')
-    
-    # 1. Save User Message
+
+    # Kick off the semantic lookup (embedding + Pinecone query) right away so its
+    # network round trips overlap with the MongoDB reads/writes below.
+    retrieval = _retrieval_executor.submit(_retrieve_semantic_context, user_id, active_clone_id, user_message)
+
+    # 1. Pull last 10 rows for tight recent context (isolated by user and clone).
+    # Read before saving the new message: the prompt appends the live user turn itself,
+    # so including it here would send it to Gemini twice.
+    # Project only the fields the prompt uses, so rows arrive without _id/bookkeeping fields
+    recent_cursor = chat_history_col.find(
+        {"user_id": user_id, "clone_id": active_clone_id},
+        {"_id": 0, "speaker": 1, "message": 1}
+    ).sort("timestamp", -1).limit(10)
+    # Reverse to chronological order
+    recent_history = list(recent_cursor)[::-1]
+
+    # 2. Save User Message
     chat_history_col.insert_one({
         "user_id": user_id,
         "clone_id": active_clone_id,
@@ -310,33 +402,24 @@ def send_message():
         "timestamp": datetime.utcnow(),
         "embedded": False
     })
-    
-    # 2. Pull last 10 rows for tight recent context (isolated by user and clone)
-    recent_cursor = chat_history_col.find({"user_id": user_id, "clone_id": active_clone_id}).sort("timestamp", -1).limit(10)
-    # Reverse to chronological order
-    recent_history = list(recent_cursor)[::-1]
-    # Remove _id for JSON serializability
-    for h in recent_history:
-        h.pop('_id', None)
-        
-    # 3. Query Pinecone
-    try:
-        query_embedding = generate_embedding(user_message, is_document=False)
-        pinecone_context = search_vectors(user_id=user_id, clone_id=active_clone_id, query_embedding=query_embedding, top_k=3)
-    except Exception as e:
-        current_app.logger.warning(f"Pinecone search failed: {e}")
-        pinecone_context = []
-        
+
     # Check if this clone is manual to pass the config or if it has a global persona prompt
     clones_col = get_clones_collection()
     clone_record = clones_col.find_one({"clone_id": active_clone_id})
     manual_config = clone_record.get('config') if clone_record and clone_record.get('is_manual') else None
     global_persona_prompt = clone_record.get('global_persona_prompt') if clone_record else None
-        
-    # 4. Generate Response
+
+    # 3. Collect Pinecone matches (started above)
+    try:
+        pinecone_context = retrieval.result()
+    except Exception as e:
+        current_app.logger.warning(f"Pinecone search failed: {e}")
+        pinecone_context = []
+
+    # 4. Generate Response (streamed back to the client chunk by chunk)
     try:
         active_persona = session.get('active_target_persona')
-        ai_response = generate_chat_response(
+        chunks = stream_chat_response(
             user_message, 
             recent_history, 
             pinecone_context, 
@@ -346,24 +429,39 @@ def send_message():
         )
     except Exception as e:
         return jsonify({"error": f"Gemini generation failed: {str(e)}"}), 500
-        
-    # 5. Save AI Response
-    chat_history_col.insert_one({
-        "user_id": user_id,
-        "clone_id": active_clone_id,
-        "speaker": "ai",
-        "message": ai_response,
-        "timestamp": datetime.utcnow(),
-        "embedded": False
+
+    # relay() can finish after the request context is gone, so capture the app logger now
+    app_logger = current_app.logger
+
+    def relay():
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            # Runs even if the client disconnects (GeneratorExit) or Gemini fails mid-stream,
+            # so whatever was produced is still saved and consolidated
+            ai_response = "".join(parts)
+
+            # 5. Save AI Response
+            if ai_response:
+                chat_history_col.insert_one({
+                    "user_id": user_id,
+                    "clone_id": active_clone_id,
+                    "speaker": "ai",
+                    "message": ai_response,
+                    "timestamp": datetime.utcnow(),
+                    "embedded": False
+                })
+
+            # 6. Queue Continuous Memory Consolidation on the background worker (Non-blocking)
+            queue_memory_consolidation(user_id, active_clone_id, app_logger)
+
+    return Response(relay(), mimetype='text/plain', headers={
+        "X-Sources-Used": str(len(pinecone_context)),
+        "X-Accel-Buffering": "no"
     })
-    
-    # 6. Trigger Continuous Memory Consolidation Thread (Non-blocking)
-    threading.Thread(target=process_continuous_memory, args=(user_id, active_clone_id), daemon=True).start()
-    
-    return jsonify({
-        "message": ai_response,
-        "sources_used": len(pinecone_context)
-    }), 200
 
 @chat_bp.route('/create_manual_persona', methods=['POST'])
 def create_manual_persona():
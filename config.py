@@ -23,6 +23,10 @@ class Config:
     # OAuth Credentials
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
+    
+    # Admin Portal Credentials (fallback defaults for local development)
+    ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'admin@iota.com')
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'adminpassword123')
 
 class DevelopmentConfig(Config):
     DEBUG = True
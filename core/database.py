@@ -1,9 +1,12 @@
+from typing import TYPE_CHECKING
 from pymongo import MongoClient
-from supabase import create_client, Client
 from flask import current_app
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 db = None
-supabase: Client = None
+supabase: "Client" = None
 
 def init_db(app):
     global db, supabase
@@ -17,6 +20,9 @@ def init_db(app):
     supabase_url = app.config['SUPABASE_URL']
     supabase_key = app.config['SUPABASE_KEY']
     if supabase_url and supabase_key:
+        # Imported lazily: the supabase SDK pulls in a large dependency tree that
+        # isn't needed at all when storage isn't configured
+        from supabase import create_client
         supabase = create_client(supabase_url, supabase_key)
     else:
         app.logger.warning("Supabase URL or Key not provided. Supabase will not be initialized.")
@@ -1,5 +1,9 @@
+import itertools
 import os
+import threading
 import time
+from array import array
+from functools import lru_cache
 import google.generativeai as genai
 from flask import current_app
 
@@ -7,9 +11,21 @@ def init_gemini(app):
     api_key = app.config.get('GOOGLE_API_KEY')
     if api_key:
         genai.configure(api_key=api_key)
+        # Warm the client in the background so the first user turn doesn't pay for channel setup
+        threading.Thread(target=_warmup_client, args=(app.logger,), daemon=True).start()
     else:
         app.logger.warning("GOOGLE_API_KEY is not set. Gemini API will fail.")
 
+def _warmup_client(logger):
+    """
+    Open the gRPC channel to the Gemini GenerativeService with one tiny query embedding.
+    embed_content and generate_content share that service client, so chat generation benefits too.
+    """
+    try:
+        generate_embedding("warmup", is_document=False)
+    except Exception as e:
+        logger.warning("Gemini client warmup failed: %s", e)
+
 # Latest embedding model — 8192 token context, native Hinglish/multilingual support
 EMBEDDING_MODEL = "models/gemini-embedding-2"
 
@@ -18,9 +34,28 @@ def generate_embedding(text: str, is_document: bool = True) -> list[float]:
     Generate vector embeddings using the latest Gemini embedding model.
     task_type is 'retrieval_document' for saving documents,
     and 'retrieval_query' for live queries.
+    Live query embeddings are memoized by whitespace-normalized text, so a repeated message skips the API round trip.
     Includes automatic retries with exponential backoff on 429 rate limit errors.
     """
-    task_type = "retrieval_document" if is_document else "retrieval_query"
+    if not is_document:
+        codes, scale = _cached_query_embedding(" ".join(text.split()))
+        step = scale / 127
+        return [q * step for q in codes]
+    return _embed_with_retries(text, "retrieval_document")
+
+@lru_cache(maxsize=2048)
+def _cached_query_embedding(text: str) -> tuple[array, float]:
+    """
+    Memoized 'retrieval_query' embedding, scalar-quantized to int8 with a per-vector scale.
+    A 3072-dim entry is ~3 KB instead of ~100 KB of boxed floats; the cosine ranking
+    Pinecone does on the dequantized query is unaffected by the rounding in practice.
+    """
+    vec = _embed_with_retries(text, "retrieval_query")
+    scale = max(map(abs, vec)) or 1.0
+    return array('b', [round(v / scale * 127) for v in vec]), scale
+
+def _embed_with_retries(text: str, task_type: str) -> list[float]:
+    """Single embed_content call with exponential backoff on 429 rate limit errors."""
     max_retries = 5
     backoff = 2.0
     
@@ -92,6 +127,30 @@ def generate_embeddings_batch(texts: list[str], is_document: bool = True) -> lis
             
     return all_embeddings
 
+GENERATION_MODEL = 'gemini-2.5-flash'
+
+# Constant prompt blocks shared by the persona builder
+_DEFAULT_STYLE_GUIDELINES = (
+    "### Writing Style Guidelines:\n"
+    "- Do NOT use emojis unless they are explicitly present in the provided matches. If matches do not use emojis, you must never use them.\n"
+    "- Mimic the exact capitalization (e.g. lowercase), sentence length (short and direct), and vocabulary/slang (Hinglish/English blend) of the matches.\n\n"
+)
+
+_ASSISTANT_PREAMBLE = "You are an intelligent, conversational AI assistant.\n\n"
+
+# Per-turn prompt pieces; %-formatting keeps assembly to a few C-level calls and one join
+_MATCH_TMPL = "Match %d:\nContext: %s\nResponse: %s\n\n"
+_HISTORY_LINE_TMPL = "%s: %s\n"
+_TURN_TMPL = "%s\nUser: %s\nAI:"
+
+@lru_cache(maxsize=64)
+def _get_model(system_instruction: str = None) -> genai.GenerativeModel:
+    """
+    Shared GenerativeModel per distinct system instruction (i.e. per active clone persona).
+    Models are stateless wrappers around the process-wide client, so reusing them across threads is safe.
+    """
+    return genai.GenerativeModel(GENERATION_MODEL, system_instruction=system_instruction)
+
 def generate_global_persona_profile(pairs: list, target_persona: str) -> str:
     """
     Analyze actual conversation pairs of the target persona to extract their global writing style profile:
@@ -118,24 +177,39 @@ def generate_global_persona_profile(pairs: list, target_persona: str) -> str:
     )
     
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = _get_model()
         response = model.generate_content(prompt)
         return response.text.strip()
     except Exception as e:
         print(f"Failed to generate global persona profile: {e}")
         return f"Mimic the vocabulary and casual tone of {target_persona}."
 
-def generate_chat_response(user_message: str, db_history: list[dict], pinecone_context: list[dict], target_persona: str = None, manual_config: dict = None, global_persona_prompt: str = None) -> str:
+def stream_chat_response(user_message: str, db_history: list[dict], pinecone_context: list[dict], target_persona: str = None, manual_config: dict = None, global_persona_prompt: str = None):
     """
-    Generate a live response using Gemini 1.5 Flash.
+    Generate a live response using Gemini 2.5 Flash, returned as an iterator of text chunks.
     Uses Dual-Context Processing: DB history + Pinecone semantic matches.
     If manual_config is provided, builds a strict character prompt.
     Otherwise, if target_persona is provided, instructs the AI to mimic that specific persona from history.
+    The request and the first chunk's text are read eagerly, so connection/quota errors and
+    blocked prompts raise here (before any response is sent) rather than mid-stream.
+    """
+    model = _get_model(_build_persona_prompt(target_persona, manual_config, global_persona_prompt))
+    response = model.generate_content(_build_turn_prompt(user_message, db_history, pinecone_context), stream=True)
+    chunks = iter(response)
+    first = next(chunks).text
+    return itertools.chain([first], (text for text in map(_chunk_text, chunks) if text))
+
+def _chunk_text(chunk) -> str:
+    """Text of a streamed chunk, or "" for chunks that carry no parts (e.g. a trailing finish/safety chunk)."""
+    if not chunk.candidates or not chunk.candidates[0].content.parts:
+        return ""
+    return chunk.text
+
+def _build_persona_prompt(target_persona: str = None, manual_config: dict = None, global_persona_prompt: str = None) -> str:
+    """
+    Build the per-clone persona block, sent as the model's system_instruction.
+    It is identical on every turn with the same clone, so it forms a stable prefix for Gemini's implicit prompt caching.
     """
-    GENERATION_MODEL = 'gemini-2.5-flash'
-    
-    model = genai.GenerativeModel(GENERATION_MODEL)
-    
     # Construct System Prompt Context
     system_prompt = ""
     if manual_config:
@@ -163,31 +237,30 @@ def generate_chat_response(user_message: str, db_history: list[dict], pinecone_c
         if global_persona_prompt:
             system_prompt += f"### Writing Style DNA & Guidelines for {target_persona} (STRICTLY ADHERE TO THESE RULES):\n{global_persona_prompt}\n\n"
         else:
-            system_prompt += (
-                "### Writing Style Guidelines:\n"
-                "- Do NOT use emojis unless they are explicitly present in the provided matches. If matches do not use emojis, you must never use them.\n"
-                "- Mimic the exact capitalization (e.g. lowercase), sentence length (short and direct), and vocabulary/slang (Hinglish/English blend) of the matches.\n\n"
-            )
+            system_prompt += _DEFAULT_STYLE_GUIDELINES
     else:
-        system_prompt = "You are an intelligent, conversational AI assistant.\n\n"
+        system_prompt = _ASSISTANT_PREAMBLE
+    
+    return system_prompt
+
+def _build_turn_prompt(user_message: str, db_history: list[dict], pinecone_context: list[dict]) -> str:
+    """Build the per-turn prompt: semantic matches, recent live history and the new user message."""
+    parts = []
     
     # 1. Inject Semantic Context from Pinecone
     if pinecone_context:
-        system_prompt += "### Relevant Past Information (Semantic Matches):\n"
-        for idx, ctx in enumerate(pinecone_context):
-            system_prompt += f"Match {idx+1}:\nContext: {ctx.get('context', '')}\nResponse: {ctx.get('response', '')}\n\n"
+        parts.append("### Relevant Past Information (Semantic Matches):\n")
+        parts.extend(
+            _MATCH_TMPL % (idx, ctx.get('context', ''), ctx.get('response', ''))
+            for idx, ctx in enumerate(pinecone_context, 1)
+        )
             
     # 2. Inject Recent Live History
     if db_history:
-        system_prompt += "### Recent Conversation History:\n"
-        for msg in db_history:
-            speaker = msg.get("speaker", "unknown").capitalize()
-            content = msg.get("message", "")
-            system_prompt += f"{speaker}: {content}\n"
-    
-    # Create the final messages array for Gemini
-    # Gemini generativeai SDK uses content arrays or a single combined prompt
-    prompt = f"{system_prompt}\nUser: {user_message}\nAI:"
+        parts.append("### Recent Conversation History:\n")
+        parts.extend(
+            _HISTORY_LINE_TMPL % (msg.get("speaker", "unknown").capitalize(), msg.get("message", ""))
+            for msg in db_history
+        )
     
-    response = model.generate_content(prompt)
-    return response.text
+    return _TURN_TMPL % ("".join(parts), user_message)
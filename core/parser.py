@@ -13,6 +13,10 @@ _NOISE_PHRASES = [
     "null"
 ]
 
+# All noise phrases folded into one alternation so _is_noise is a single C-level scan.
+# Plain substring semantics (no word boundaries), same as checking each phrase in turn.
+_NOISE_RE = re.compile("|".join(re.escape(p) for p in dict.fromkeys(_NOISE_PHRASES)))
+
 # WhatsApp timestamp — STRICT anchored patterns (timestamp REQUIRED)
 # iOS:     [DD/MM/YY, HH:MM:SS] Name: text
 # Android: DD/MM/YY, HH:MM - Name: text
@@ -35,8 +39,7 @@ _VALID_NAME = re.compile(r"^[A-Za-z][A-Za-z\s\-'.]{1,39}$")
 
 def _is_noise(text: str) -> bool:
     """Return True if the text is a WhatsApp system / omission notice."""
-    lower = text.lower()
-    return any(phrase in lower for phrase in _NOISE_PHRASES)
+    return _NOISE_RE.search(text.lower()) is not None
 
 
 def _parse_raw_entries(file_content: str) -> list[dict]:
@@ -67,15 +70,13 @@ def _parse_raw_entries(file_content: str) -> list[dict]:
             if not _VALID_NAME.match(speaker):
                 continue
 
-            # Drop message bodies that are just noise phrases
-            if _is_noise(text):
-                continue
-
+            # No separate noise check on the body: it is a substring of `line`,
+            # which already passed _is_noise above.
             if text:
                 entries.append({"speaker": speaker, "text": text})
         else:
             # Continuation of previous message (multi-line text without timestamp)
-            if entries and not _is_noise(line):
+            if entries:
                 entries[-1]["text"] += " " + line
 
     return entries
@@ -131,9 +132,10 @@ def parse_whatsapp_to_pairs(file_content: str, target_persona: str) -> list[dict
         return []
 
     pairs: list[dict] = []
+    target = target_persona.lower()
 
     for i, turn in enumerate(turns):
-        if turn["speaker"].lower() != target_persona.lower():
+        if turn["speaker"].lower() != target:
             continue
 
         friend_response = turn["text"]
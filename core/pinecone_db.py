@@ -1,6 +1,13 @@
-from pinecone import Pinecone, ServerlessSpec
+from pinecone import ServerlessSpec
 from flask import current_app
 
+# Prefer the gRPC transport (HTTP/2 + protobuf payloads, much lighter than JSON for
+# 3072-dim float vectors); fall back to REST if the grpc extra isn't installed.
+try:
+    from pinecone.grpc import PineconeGRPC as Pinecone
+except ImportError:
+    from pinecone import Pinecone
+
 pc = None
 index = None
 
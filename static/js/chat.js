@@ -48,7 +48,11 @@ document.addEventListener('DOMContentLoaded', () => {
         newChatBtn.addEventListener('click', showNewChatHub);
     }
 
-    function appendMessage(text, isUser) {
+    // Keep the live chat DOM bounded, mirroring the 50-message window served by /chat/get_history
+    const MAX_RENDERED_MESSAGES = 50;
+
+    // Message bubble skeletons are built once per role and cloned on every append
+    function buildBubbleTemplate(isUser) {
         const div = document.createElement('div');
         div.className = `flex ${isUser ? 'justify-end' : 'justify-start'}`;
         
@@ -61,14 +65,33 @@ document.addEventListener('DOMContentLoaded', () => {
         
         const p = document.createElement('p');
         p.className = 'text-[15px] leading-relaxed whitespace-pre-wrap';
-        p.innerText = text;
         
         bubble.appendChild(p);
         div.appendChild(bubble);
+        return div;
+    }
+    const userBubbleTemplate = buildBubbleTemplate(true);
+    const aiBubbleTemplate = buildBubbleTemplate(false);
+
+    function createMessageNode(text, isUser) {
+        const div = (isUser ? userBubbleTemplate : aiBubbleTemplate).cloneNode(true);
+        div.firstChild.firstChild.innerText = text;
+        return div;
+    }
+
+    function appendMessage(text, isUser) {
+        const div = createMessageNode(text, isUser);
+        const p = div.firstChild.firstChild;
         chatContainer.appendChild(div);
         
+        // Drop the oldest bubbles so long sessions don't keep growing layout cost
+        while (chatContainer.childElementCount > MAX_RENDERED_MESSAGES) {
+            chatContainer.firstElementChild.remove();
+        }
+        
         // Scroll to bottom
         chatContainer.scrollTop = chatContainer.scrollHeight;
+        return p;
     }
 
     function showTypingIndicator() {
@@ -125,8 +148,19 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
             
-            const data = await res.json();
-            appendMessage(data.message, false);
+            // Render the reply as it streams in rather than waiting for the full generation
+            const replyText = appendMessage('', false);
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let reply = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                reply += decoder.decode(value, { stream: true });
+                replyText.innerText = reply;
+                chatContainer.scrollTop = chatContainer.scrollHeight;
+            }
+            replyText.innerText = reply + decoder.decode();
             
         } catch (err) {
             hideTypingIndicator();
@@ -484,13 +518,14 @@ document.addEventListener('DOMContentLoaded', () => {
             const res = await fetch('/chat/get_history');
             const data = await res.json();
             
-            chatContainer.innerHTML = ''; // Clear loading/placeholder state
-            
             if (data.history && data.history.length > 0) {
-                data.history.forEach(msg => {
+                // Build the whole transcript off-DOM and swap it in with a single layout pass
+                const fragment = document.createDocumentFragment();
+                data.history.slice(-MAX_RENDERED_MESSAGES).forEach(msg => {
                     const isUser = msg.speaker === 'user';
-                    appendMessage(msg.message, isUser);
+                    fragment.appendChild(createMessageNode(msg.message, isUser));
                 });
+                chatContainer.replaceChildren(fragment); // Also clears loading/placeholder state
             } else {
                 // Empty state for brand new persona
                 chatContainer.innerHTML = `